@@ -1,100 +1,114 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Literal
+from typing import Dict, List, Tuple
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
 import os
-import json
-import requests
-
-# ---------------------------
-# Data Models
-# ---------------------------
-
-FluidSystem = Literal[
-    "transmission",
-    "front_diff",
-    "rear_diff",
-    "transfer_case",
-    "coolant",
-    "power_steering",
-    "engine_oil",
-]
-
-class FluidProduct(BaseModel):
-    id: str
-    name: str
-    type: FluidSystem
-    compatible_specs: List[str]
-    not_for_specs: List[str] = []
-    notes: str | None = None
-
-class FluidMatch(BaseModel):
-    product: FluidProduct
-    match_reason: str
-
-class FluidWarning(BaseModel):
-    message: str
-    products: List[str] = []
-
-class FluidRequirement(BaseModel):
-    system: FluidSystem
-    required_spec: str
-    oem_name: str | None = None
-    matches: List[FluidMatch]
-    warnings: List[FluidWarning]
-
-class VehicleInfo(BaseModel):
-    vin: str
-    year: int | None
-    make: str | None
-    model: str | None
-    trim: str | None = None
-    engine: str | None = None
-
-class FluidResponse(BaseModel):
-    vehicle: VehicleInfo
-    fluids: List[FluidRequirement]
-
-
-# ---------------------------
-# Load Fluid Inventory
-# ---------------------------
-
-INVENTORY_FILE = os.path.join(os.path.dirname(__file__), "fluid_inventory.json")
-
-def load_inventory() -> List[FluidProduct]:
-    try:
-        with open(INVENTORY_FILE, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        return [FluidProduct(**item) for item in raw]
-    except Exception as e:
-        raise RuntimeError(f"Error loading fluid inventory: {e}")
-
-FLUID_INVENTORY = load_inventory()
-
+import re
+import time
+import httpx
+import orjson
+
+# works both as backend.api_server (from the repo root) and as api_server (from backend/)
+try:
+    from .matching import enrich_with_matches
+    from .models import FluidRequirement, FluidResponse, FluidSystem, VehicleInfo
+except ImportError:
+    from matching import enrich_with_matches
+    from models import FluidRequirement, FluidResponse, FluidSystem, VehicleInfo
 
 # ---------------------------
 # FREE NHTSA VIN Decoder
 # ---------------------------
 
-def call_nhtsa(vin: str):
+# shared keep-alive client, closed on app shutdown (see lifespan below)
+ASYNC_CLIENT = httpx.AsyncClient(
+    timeout=8.0,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+)
+
+async def call_nhtsa(vin: str):
     url = f"https://vpic.nhtsa.dot.gov/api/vehicles/DecodeVinValuesExtended/{vin}?format=json"
-    resp = requests.get(url, timeout=8)
+    resp = await ASYNC_CLIENT.get(url)
 
     if resp.status_code != 200:
         raise RuntimeError(f"NHTSA request failed: {resp.status_code}")
 
-    data = resp.json()
+    data = orjson.loads(resp.content)
     if "Results" not in data or not data["Results"]:
         raise RuntimeError("No VIN info returned from NHTSA")
 
     return data["Results"][0]
 
 
+# VIN decoders in order of preference; all are queried concurrently
+VIN_DECODERS = (call_nhtsa,)
+
+async def decode_vin(vin: str):
+    results = await asyncio.gather(
+        *(decoder(vin) for decoder in VIN_DECODERS), return_exceptions=True
+    )
+    for result in results:
+        if not isinstance(result, BaseException):
+            return result
+    raise results[0]
+
+
 # ---------------------------
 # TEMPORARY FLUID GENERATION (test mode)
 # ---------------------------
 
+# required spec per system, by uppercased make ("_DEFAULT" for anything else)
+TEMP_FLUID_SPECS: Dict[str, Dict[FluidSystem, str]] = {
+    "FORD": {
+        "transmission": "MERCON ULV",
+        "coolant": "MOTORCRAFT YELLOW",
+        "front_diff": "75W-85",
+        "rear_diff": "75W-140",
+        "transfer_case": "MERCON LV",
+        "power_steering": "CHF 11S",
+        "engine_oil": "5W-30"
+    },
+    "HONDA": {
+        "transmission": "HONDA ATF DW-1",
+        "coolant": "HONDA TYPE 2",
+        "front_diff": "75W-90",
+        "rear_diff": "75W-90",
+        "transfer_case": "HONDA DPSF",
+        "power_steering": "HONDA PSF",
+        "engine_oil": "0W-20"
+    },
+    "_DEFAULT": {
+        "transmission": "UNKNOWN ATF",
+        "coolant": "UNKNOWN COOLANT",
+        "front_diff": "75W-90",
+        "rear_diff": "75W-140",
+        "transfer_case": "DEXRON III",
+        "power_steering": "PSF GENERIC",
+        "engine_oil": "5W-30"
+    },
+}
+
+def build_requirements(required: Dict[FluidSystem, str]) -> List[FluidRequirement]:
+    return [
+        FluidRequirement(
+            system=system,
+            required_spec=spec,
+            oem_name=None,
+            matches=[],
+            warnings=[]
+        )
+        for system, spec in required.items()
+    ]
+
+# the fluid list only depends on make, so match each TEMP_FLUID_SPECS entry once at startup
+PRECOMPUTED_FLUIDS: Dict[str, List[FluidRequirement]] = {
+    make: enrich_with_matches(build_requirements(required))
+    for make, required in TEMP_FLUID_SPECS.items()
+}
+
 def extract_vehicle_and_fluids(nhtsa):
     # ---- Vehicle Info ----
     vehicle = VehicleInfo(
@@ -107,134 +121,105 @@ def extract_vehicle_and_fluids(nhtsa):
     )
 
     # ---- TEMPORARY FLUID SPECS ----
+    # shared, already-matched requirements; never mutated per request
     make = (vehicle.make or "").upper()
-
-    if make == "FORD":
-        required = {
-            "transmission": "MERCON ULV",
-            "coolant": "MOTORCRAFT YELLOW",
-            "front_diff": "75W-85",
-            "rear_diff": "75W-140",
-            "transfer_case": "MERCON LV",
-            "power_steering": "CHF 11S",
-            "engine_oil": "5W-30"
-        }
-    elif make == "HONDA":
-        required = {
-            "transmission": "HONDA ATF DW-1",
-            "coolant": "HONDA TYPE 2",
-            "front_diff": "75W-90",
-            "rear_diff": "75W-90",
-            "transfer_case": "HONDA DPSF",
-            "power_steering": "HONDA PSF",
-            "engine_oil": "0W-20"
-        }
-    else:
-        required = {
-            "transmission": "UNKNOWN ATF",
-            "coolant": "UNKNOWN COOLANT",
-            "front_diff": "75W-90",
-            "rear_diff": "75W-140",
-            "transfer_case": "DEXRON III",
-            "power_steering": "PSF GENERIC",
-            "engine_oil": "5W-30"
-        }
-
-    # convert to FluidRequirement list
-    fluid_reqs = [
-        FluidRequirement(
-            system=system,
-            required_spec=spec,
-            oem_name=None,
-            matches=[],
-            warnings=[]
-        )
-        for system, spec in required.items()
-    ]
+    fluid_reqs = PRECOMPUTED_FLUIDS.get(make, PRECOMPUTED_FLUIDS["_DEFAULT"])
 
     return vehicle, fluid_reqs
 
 
 # ---------------------------
-# Match Fluids in Inventory
+# FastAPI Server
 # ---------------------------
 
-def normalize(s: str) -> str:
-    return s.strip().upper().replace(" ", "")
-
-def enrich_with_matches(fluid_reqs):
-    for req in fluid_reqs:
-        needed = normalize(req.required_spec)
-
-        matches = []
-        bad = []
-
-        for product in FLUID_INVENTORY:
-            if product.type != req.system:
-                continue
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await ASYNC_CLIENT.aclose()
 
-            compat = [normalize(x) for x in product.compatible_specs]
-            forbid = [normalize(x) for x in product.not_for_specs]
+app = FastAPI(title="Sils Auto Fluid API (Test Mode)", lifespan=lifespan)
 
-            if needed in forbid:
-                bad.append(product.name)
-                continue
-
-            if needed in compat:
-                matches.append(
-                    FluidMatch(
-                        product=product,
-                        match_reason=f"Matched spec: {req.required_spec}"
-                    )
-                )
-
-        req.matches = matches
-
-        warnings = []
-        if not matches:
-            warnings.append(
-                FluidWarning(
-                    message=f"No compatible fluid found for {req.system.replace('_',' ')} spec '{req.required_spec}'."
-                )
-            )
-        if bad:
-            warnings.append(
-                FluidWarning(
-                    message=f"DO NOT USE for {req.system.replace('_',' ')}:",
-                    products=bad
-                )
-            )
-        req.warnings = warnings
+# comma-separated list of frontend origins, e.g. "http://192.168.1.20:8080"; "*" allows any
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.environ.get("ALLOWED_ORIGINS", "*").split(",")
+    if origin.strip()
+]
 
-    return fluid_reqs
+# the frontend only does plain GETs without cookies
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=ALLOWED_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET"],
+)
 
+# 17 chars, no I/O/Q (never used in VINs)
+VIN_RE = re.compile(r"[A-HJ-NPR-Z0-9]{17}")
 
-# ---------------------------
-# FastAPI Server
-# ---------------------------
+# full responses are a pure function of the VIN, so keep recent ones:
+# VIN -> (cached_at, serialized JSON, ETag). Browsers and any CDN get the same TTL.
+RESPONSE_CACHE_TTL = 24 * 60 * 60
+RESPONSE_CACHE_MAXSIZE = 4096
+RESPONSE_CACHE: "OrderedDict[str, Tuple[float, bytes, str]]" = OrderedDict()
+CACHE_CONTROL = f"public, max-age={RESPONSE_CACHE_TTL}"
 
-app = FastAPI(title="Sils Auto Fluid API (Test Mode)")
+def lru_put(cache: OrderedDict, key, value, maxsize: int):
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > maxsize:
+        cache.popitem(last=False)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
+# response_model is kept for the OpenAPI schema; returning a Response skips re-serialization
 @app.get("/api/fluids/{vin}", response_model=FluidResponse)
-def get_fluids(vin: str):
+async def get_fluids(vin: str, request: Request):
     vin = vin.strip().upper()
     if len(vin) != 17:
         raise HTTPException(status_code=400, detail="VIN must be 17 characters.")
+    if not VIN_RE.fullmatch(vin):
+        raise HTTPException(status_code=400, detail="Invalid VIN format.")
+
+    cached = RESPONSE_CACHE.get(vin)
+    if cached and time.monotonic() - cached[0] < RESPONSE_CACHE_TTL:
+        RESPONSE_CACHE.move_to_end(vin)
+        return cached_json_response(request, cached[1], cached[2])
 
     try:
-        nhtsa = call_nhtsa(vin)
+        nhtsa = await decode_vin(vin)
         vehicle, fluid_reqs = extract_vehicle_and_fluids(nhtsa)
-        enriched = enrich_with_matches(fluid_reqs)
-        return FluidResponse(vehicle=vehicle, fluids=enriched)
+        response = FluidResponse(vehicle=vehicle, fluids=fluid_reqs)
+        body = orjson.dumps(response.model_dump())
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        lru_put(RESPONSE_CACHE, vin, (time.monotonic(), body, etag), RESPONSE_CACHE_MAXSIZE)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    return cached_json_response(request, body, etag)
+
+
+# ---------------------------
+# Entrypoint
+# ---------------------------
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop event loop + httptools parser, one worker per core by default
+    uvicorn.run(
+        "api_server:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1),
+    )
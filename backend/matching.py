@@ -0,0 +1,93 @@
+from typing import Dict, List, Tuple, get_args
+from collections import defaultdict
+from functools import lru_cache
+import os
+import json
+
+try:
+    from .models import FluidMatch, FluidProduct, FluidSystem, FluidWarning
+except ImportError:
+    from models import FluidMatch, FluidProduct, FluidSystem, FluidWarning
+
+# ---------------------------
+# Load Fluid Inventory
+# ---------------------------
+
+@lru_cache(maxsize=512)
+def normalize(s: str) -> str:
+    # specs are a small fixed vocabulary and usually already normalized
+    if " " not in s and s.isupper() and s == s.strip():
+        return s
+    return s.strip().upper().replace(" ", "")
+
+INVENTORY_FILE = os.path.join(os.path.dirname(__file__), "fluid_inventory.json")
+
+def load_inventory() -> List[FluidProduct]:
+    try:
+        with open(INVENTORY_FILE, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        return [FluidProduct.model_validate(item) for item in raw]
+    except Exception as e:
+        raise RuntimeError(f"Error loading fluid inventory: {e}")
+
+def build_indexes(inventory: List[FluidProduct]):
+    """Map (system, normalized spec) -> prebuilt matches / forbidden product names,
+    so matching is a dict lookup per requirement."""
+    compat: Dict[Tuple[FluidSystem, str], List[FluidMatch]] = defaultdict(list)
+    forbid: Dict[Tuple[FluidSystem, str], List[str]] = defaultdict(list)
+    for product in inventory:
+        not_for = {normalize(spec) for spec in product.not_for_specs}
+        for spec in not_for:
+            forbid[(product.type, spec)].append(product.name)
+        # a forbidden spec never counts as a match, even if also listed as compatible
+        seen = not_for
+        for spec in product.compatible_specs:
+            norm = normalize(spec)
+            if norm in seen:
+                continue
+            seen.add(norm)
+            compat[(product.type, norm)].append(
+                FluidMatch(product=product, match_reason=f"Matched spec: {spec}")
+            )
+    return compat, forbid
+
+FLUID_INVENTORY = load_inventory()
+COMPAT_MATCHES_INDEX, FORBID_NAMES_INDEX = build_indexes(FLUID_INVENTORY)
+
+
+# ---------------------------
+# Match Fluids in Inventory
+# ---------------------------
+
+# human-readable system names for warning messages
+SYSTEM_DISPLAY: Dict[FluidSystem, str] = {
+    system: system.replace("_", " ") for system in get_args(FluidSystem)
+}
+
+def enrich_with_matches(fluid_reqs):
+    for req in fluid_reqs:
+        needed = normalize(req.required_spec)
+        key = (req.system, needed)
+        # shared, prebuilt FluidMatch objects; never mutated per request
+        matches = COMPAT_MATCHES_INDEX.get(key, [])
+        bad = FORBID_NAMES_INDEX.get(key, [])
+
+        req.matches = matches
+
+        warnings = []
+        if not matches:
+            warnings.append(
+                FluidWarning(
+                    message=f"No compatible fluid found for {SYSTEM_DISPLAY[req.system]} spec '{req.required_spec}'."
+                )
+            )
+        if bad:
+            warnings.append(
+                FluidWarning(
+                    message=f"DO NOT USE for {SYSTEM_DISPLAY[req.system]}:",
+                    products=bad
+                )
+            )
+        req.warnings = warnings
+
+    return fluid_reqs
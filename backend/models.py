@@ -0,0 +1,57 @@
+from pydantic import BaseModel, ConfigDict
+from typing import List, Literal, Tuple
+
+# ---------------------------
+# Data Models
+# ---------------------------
+
+FluidSystem = Literal[
+    "transmission",
+    "front_diff",
+    "rear_diff",
+    "transfer_case",
+    "coolant",
+    "power_steering",
+    "engine_oil",
+]
+
+# inventory products and their prebuilt matches are shared by every response,
+# so they are frozen
+class FluidProduct(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    name: str
+    type: FluidSystem
+    compatible_specs: Tuple[str, ...]
+    not_for_specs: Tuple[str, ...] = ()
+    notes: str | None = None
+
+class FluidMatch(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    product: FluidProduct
+    match_reason: str
+
+class FluidWarning(BaseModel):
+    message: str
+    products: List[str] = []
+
+class FluidRequirement(BaseModel):
+    system: FluidSystem
+    required_spec: str
+    oem_name: str | None = None
+    matches: List[FluidMatch]
+    warnings: List[FluidWarning]
+
+class VehicleInfo(BaseModel):
+    vin: str
+    year: int | None
+    make: str | None
+    model: str | None
+    trim: str | None = None
+    engine: str | None = None
+
+class FluidResponse(BaseModel):
+    vehicle: VehicleInfo
+    fluids: List[FluidRequirement]